@@ -6,102 +6,222 @@ Optimized for speed with ~0.1s startup time
 
 import json
 import sys
+import os
 import hashlib
+import pickle
+import atexit
 import numpy as np
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import argparse
-from collections import Counter
 import re
 
+# orjson serializes ~10x faster than stdlib json and can emit ndarrays
+# directly; fall back to stdlib so the embedder stays dependency-light
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _write_json(obj: Dict[str, Any]) -> None:
+    """Serialize a result dict to stdout, preferring orjson"""
+    if orjson is not None:
+        sys.stdout.buffer.write(orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY))
+        sys.stdout.buffer.write(b'\n')
+        sys.stdout.buffer.flush()
+    else:
+        # Embeddings stay as ndarrays until this boundary; only stdlib
+        # json needs them expanded into Python lists
+        print(json.dumps(obj, default=lambda o: o.tolist()))
+
+def _read_json(data: bytes) -> Any:
+    """Parse JSON input bytes, preferring orjson"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
 class FastEmbedder:
-    def __init__(self):
+    # ASCII \w matches against a 256-entry table instead of walking Unicode
+    # property tables, and code identifiers are ASCII anyway
+    _TOKEN_RE = re.compile(r'\w+', re.ASCII)
+
+    def __init__(self, cache_dir: Optional[str] = None):
         """Initialize fast embedder with pre-computed word vectors"""
         # Simple word frequency-based embeddings
         self.vocab_size = 384  # Standard embedding dimension
-        self.word_cache = {}
-        
+        # Word vectors live in one matrix so text embeddings reduce to a
+        # single weighted row sum (counts @ matrix) instead of a Python loop.
+        # The matrix is over-allocated and doubled on demand; _size tracks
+        # how many rows are actually in use
+        self._vocab = {}  # word -> row index into self._matrix
+        self._matrix = np.empty((1024, self.vocab_size), dtype=np.float32)
+        self._size = 0
+        # With a cache dir, word vectors persist across invocations so warm
+        # runs skip rehashing the corpus vocabulary entirely
+        self._cache_dir = cache_dir
+        self._loaded_size = 0
+        if cache_dir:
+            self._load_cache()
+            atexit.register(self._save_cache)
+
+    def _load_cache(self) -> None:
+        """Restore the word matrix persisted by a previous run, if any"""
+        vocab_path = os.path.join(self._cache_dir, 'fast_vocab.pkl')
+        matrix_path = os.path.join(self._cache_dir, 'fast_vocab.bin')
+        try:
+            with open(vocab_path, 'rb') as f:
+                vocab = pickle.load(f)
+            # memmap validates that the file really holds len(vocab) rows
+            rows = np.memmap(matrix_path, dtype=np.float32, mode='r',
+                             shape=(len(vocab), self.vocab_size))
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            # Cold start or stale/corrupt cache - just rebuild from scratch
+            return
+
+        self._ensure_capacity(len(vocab))
+        self._matrix[:len(vocab)] = rows
+        self._vocab = vocab
+        self._size = len(vocab)
+        self._loaded_size = len(vocab)
+
+    def _save_cache(self) -> None:
+        """Persist the word matrix for the next invocation"""
+        if self._size == self._loaded_size:
+            return
+        try:
+            os.makedirs(self._cache_dir, exist_ok=True)
+            self._matrix[:self._size].tofile(os.path.join(self._cache_dir, 'fast_vocab.bin'))
+            with open(os.path.join(self._cache_dir, 'fast_vocab.pkl'), 'wb') as f:
+                pickle.dump(self._vocab, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError:
+            pass  # cache is best-effort; embedding output is unaffected
+
     def tokenize(self, text: str) -> List[str]:
         """Simple tokenization"""
         # Convert to lowercase and split on non-alphanumeric
-        tokens = re.findall(r'\b\w+\b', text.lower())
-        return tokens
+        return self._TOKEN_RE.findall(text.lower())
     
     def get_word_embedding(self, word: str) -> np.ndarray:
         """Generate consistent embedding for a word using hash"""
-        if word in self.word_cache:
-            return self.word_cache[word]
-        
-        # Use word hash to generate consistent embedding
-        word_hash = hashlib.md5(word.encode()).hexdigest()
-        
-        # Convert hash to numbers and normalize
-        embedding = np.array([
-            int(word_hash[i:i+2], 16) / 255.0 - 0.5 
-            for i in range(0, min(len(word_hash), self.vocab_size * 2), 2)
-        ])
-        
-        # Pad or truncate to vocab_size
-        if len(embedding) < self.vocab_size:
-            embedding = np.pad(embedding, (0, self.vocab_size - len(embedding)))
-        else:
-            embedding = embedding[:self.vocab_size]
-        
-        # Normalize to unit vector
-        norm = np.linalg.norm(embedding)
-        if norm > 0:
-            embedding = embedding / norm
-        
-        self.word_cache[word] = embedding
-        return embedding
-    
-    def embed_text(self, text: str) -> List[float]:
+        index = self._vocab.get(word)
+        if index is None:
+            index = self._add_word(word)
+        return self._matrix[index]
+
+    def _add_word(self, word: str) -> int:
+        """Add a word vector to the matrix, returning its row index"""
+        self._add_words([word])
+        return self._vocab[word]
+
+    def _ensure_capacity(self, extra: int) -> None:
+        """Grow the matrix geometrically to fit extra more rows"""
+        capacity = self._matrix.shape[0]
+        needed = self._size + extra
+        if needed > capacity:
+            grown = np.empty((max(2 * capacity, needed), self.vocab_size), dtype=np.float32)
+            grown[:self._size] = self._matrix[:self._size]
+            self._matrix = grown
+
+    def _add_words(self, words: List[str]) -> None:
+        """Hash a batch of new words into the matrix in one pass"""
+        self._ensure_capacity(len(words))
+        base = self._size
+        new_rows = self._matrix[base:base + len(words)]
+
+        # shake_256 supports arbitrary digest sizes, so each raw digest fills
+        # all 384 dimensions directly - no hex parsing or padding needed
+        shake_256 = hashlib.shake_256
+        digest_size = self.vocab_size
+        for i, word in enumerate(words):
+            raw = shake_256(word.encode('utf-8')).digest(digest_size)
+            new_rows[i] = np.frombuffer(raw, dtype=np.uint8)
+
+        # Center, scale, and unit-normalize the whole batch at once
+        new_rows -= 127.5
+        new_rows *= 1.0 / 255.0
+        new_rows /= np.linalg.norm(new_rows, axis=1, keepdims=True) + 1e-12
+
+        self._size += len(words)
+        for i, word in enumerate(words):
+            self._vocab[word] = base + i
+
+    def embed_text(self, text: str) -> np.ndarray:
         """Generate embedding for text using word averaging"""
         tokens = self.tokenize(text)
-        
+
         if not tokens:
-            return [0.0] * self.vocab_size
-        
-        # Get word frequencies for TF weighting
-        word_counts = Counter(tokens)
-        total_words = len(tokens)
-        
-        # Average word embeddings with TF weighting
-        text_embedding = np.zeros(self.vocab_size)
-        
-        for word, count in word_counts.items():
-            word_emb = self.get_word_embedding(word)
-            tf_weight = count / total_words
-            text_embedding += word_emb * tf_weight
-        
-        # Normalize final embedding
-        norm = np.linalg.norm(text_embedding)
-        if norm > 0:
-            text_embedding = text_embedding / norm
-        
-        return text_embedding.tolist()
+            return np.zeros(self.vocab_size, dtype=np.float32)
+
+        # Hash all unseen tokens into the matrix in a single batch
+        unknown = [token for token in dict.fromkeys(tokens) if token not in self._vocab]
+        if unknown:
+            self._add_words(unknown)
+
+        # TF-weighted sum as one matrix-vector product instead of
+        # accumulating word vectors one at a time in Python
+        ids = np.fromiter(
+            map(self._vocab.__getitem__, tokens),
+            dtype=np.int32, count=len(tokens)
+        )
+        unique_ids, counts = np.unique(ids, return_counts=True)
+        weights = counts.astype(np.float32) / len(tokens)
+        text_embedding = weights @ self._matrix[unique_ids]
+
+        # Normalize final embedding in place; the GEMV result is a fresh
+        # buffer, so no caller-visible array is mutated
+        norm = np.sqrt(np.dot(text_embedding, text_embedding))
+        text_embedding *= 1.0 / (norm + 1e-12)
+
+        return text_embedding
     
-    def embed_chunks(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Embed multiple chunks"""
+    def embed_chunks(self, chunks: List[Dict[str, Any]], workers: int = 1) -> List[Dict[str, Any]]:
+        """Embed multiple chunks, optionally across worker processes"""
+        contents = [chunk.get('content', '') for chunk in chunks]
+
+        # Identical contents (license headers, repeated boilerplate) get
+        # embedded once and the vector is shared by every duplicate
+        unique_contents = list(dict.fromkeys(contents))
+
+        if workers > 1 and len(unique_contents) > 1:
+            # Data-parallel across processes; each worker builds its own
+            # embedder so nothing heavier than the texts gets pickled
+            from multiprocessing import Pool
+            chunksize = max(1, len(unique_contents) // (workers * 4))
+            with Pool(workers, initializer=_init_worker) as pool:
+                embeddings = pool.map(_embed_worker, unique_contents, chunksize=chunksize)
+        else:
+            embeddings = [self.embed_text(content) for content in unique_contents]
+
+        embedding_by_content = dict(zip(unique_contents, embeddings))
+
         result = []
-        for chunk in chunks:
-            content = chunk.get('content', '')
-            embedding = self.embed_text(content)
-            
+        for chunk, content in zip(chunks, contents):
             chunk_with_embedding = chunk.copy()
-            chunk_with_embedding['embedding'] = embedding
+            chunk_with_embedding['embedding'] = embedding_by_content[content]
             result.append(chunk_with_embedding)
-        
+
         return result
 
+# Process-local embedder for the multiprocessing path; created lazily in
+# each worker so the parent never pickles embedder state
+_worker_embedder = None
+
+def _init_worker():
+    global _worker_embedder
+    _worker_embedder = FastEmbedder()
+
+def _embed_worker(content: str) -> np.ndarray:
+    return _worker_embedder.embed_text(content)
+
 def main():
     parser = argparse.ArgumentParser(description='Fast Context-RAG Embedder')
     parser.add_argument('--model', default='fast-embedder', help='Model name (ignored)')
-    parser.add_argument('--cache-dir', default='.context-rag/embeddings', help='Cache directory (ignored)')
+    parser.add_argument('--cache-dir', default='.context-rag/embeddings', help='Cache directory for persisted word vectors')
     parser.add_argument('--text', help='Single text to embed')
-    
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes for batch embedding')
+
     args = parser.parse_args()
     
-    embedder = FastEmbedder()
+    embedder = FastEmbedder(cache_dir=args.cache_dir)
     
     if args.text:
         # Single text embedding
@@ -111,19 +231,20 @@ def main():
             'embedding': embedding,
             'model': 'fast-embedder'
         }
-        print(json.dumps(result))
+        _write_json(result)
         return
     
     # Read from stdin for batch processing
     try:
-        input_data = json.loads(sys.stdin.read())
+        # Read raw bytes so orjson can parse without a str round-trip
+        input_data = _read_json(sys.stdin.buffer.read())
         
         if 'chunks' in input_data:
             chunks_data = input_data['chunks']
         else:
             chunks_data = input_data
         
-        embedded_chunks = embedder.embed_chunks(chunks_data)
+        embedded_chunks = embedder.embed_chunks(chunks_data, workers=args.workers)
         
         result = {
             'model': 'fast-embedder',
@@ -131,7 +252,7 @@ def main():
             'total_chunks': len(embedded_chunks)
         }
         
-        print(json.dumps(result))
+        _write_json(result)
         
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)